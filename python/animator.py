@@ -0,0 +1,102 @@
+# Renders the yearly combined maps into a time series movie (GIF or MP4)
+# Requires: combined maps downloaded locally, see post_processor.py and raster_io.py
+# Frames are rendered on a process pool and streamed to the writer.  For MP4 (needs imageio-ffmpeg), frames
+# are piped to ffmpeg, so only a few are in memory at a time.  GIF output is buffered: imageio's GIF writer
+# keeps every frame until the file is closed, so memory grows with the number of frames.
+
+import collections
+import concurrent.futures
+import os
+
+import imageio
+import numpy as np
+
+from raster_io import bounded_map, read_class_map_in_bbox, results_path
+
+# RGB colour for each class value; the uint8 maps index straight into this table
+palette = np.zeros((256, 3), dtype=np.uint8)
+palette[0] = (235, 235, 235)    # not irrigated
+palette[1] = (110, 170, 230)    # irrigated (low)
+palette[2] = (20, 60, 160)      # irrigated (high)
+
+# Per-worker cache of rendered key frames, so transition frames do not re-read the same GeoTIFF
+_key_frame_cache = collections.OrderedDict()
+_key_frame_cache_size = 2
+
+
+def downsample(class_map, factor):
+    # Max-pool so that small irrigated areas don't vanish when zooming out; stays in uint8
+    if factor == 1:
+        return class_map
+    height = class_map.shape[0] // factor * factor
+    width = class_map.shape[1] // factor * factor
+    blocks = class_map[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.max(axis=(1, 3))
+
+
+def render_key_frame(path, bbox, factor):
+    key = (path, bbox, factor)
+    if key in _key_frame_cache:
+        _key_frame_cache.move_to_end(key)
+        return _key_frame_cache[key]
+    class_map, _ = read_class_map_in_bbox(path, bbox)
+    frame = palette[downsample(class_map, factor)]
+    _key_frame_cache[key] = frame
+    if len(_key_frame_cache) > _key_frame_cache_size:
+        _key_frame_cache.popitem(last=False)
+    return frame
+
+
+def render_frame(job):
+    path_from, path_to, step, num_steps, bbox, factor = job
+    frame_from = render_key_frame(path_from, bbox, factor)
+    if step == 0:
+        return frame_from
+    frame_to = render_key_frame(path_to, bbox, factor)
+    # Integer cross-fade: uint16 is wide enough for 255 * num_steps as long as num_steps <= 257
+    blended = frame_from.astype(np.uint16) * (num_steps - step) + frame_to.astype(np.uint16) * step
+    return (blended // num_steps).astype(np.uint8)
+
+
+def frame_jobs(paths, transition_frames, bbox, factor):
+    num_steps = transition_frames + 1
+    assert num_steps <= 257, "Too many transition frames for integer blending"
+    for path_from, path_to in zip(paths, paths[1:]):
+        for step in range(num_steps):
+            yield path_from, path_to, step, num_steps, bbox, factor
+    yield paths[-1], paths[-1], 0, num_steps, bbox, factor
+
+
+def get_writer(output_path, fps):
+    # Keep GIFs short or downsampled, see above
+    if output_path.lower().endswith(".gif"):
+        return imageio.get_writer(output_path, mode="I", duration=1000 / fps, loop=0)
+    return imageio.get_writer(output_path, fps=fps)
+
+
+def render_animation(years, output_path, bbox=None, downsample_factor=1, transition_frames=0, fps=4,
+                     max_workers=None):
+    paths = [results_path(year) for year in years]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"Missing maps: {missing}")
+
+    max_workers = max_workers or os.cpu_count()
+    jobs = frame_jobs(paths, transition_frames, bbox, downsample_factor)
+    num_frames = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            get_writer(output_path, fps) as writer:
+        for frame in bounded_map(executor, render_frame, jobs, max_in_flight=2 * max_workers):
+            writer.append_data(frame)
+            num_frames += 1
+    print(f"Wrote {num_frames} frames to {output_path}")
+    return num_frames
+
+
+def main():
+    years = range(2001, 2016)
+    render_animation(years, "irrigation_2001_2015.mp4", downsample_factor=4, transition_frames=3)
+
+
+if __name__ == '__main__':
+    main()
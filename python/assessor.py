@@ -1,5 +1,6 @@
 import ee
 
+import profiler
 from sampler import get_or_create_worldwide_sample_points
 from common import base_asset_directory, assess_seed
 
@@ -10,9 +11,9 @@ def assess_combined_map(map_image):
         .reduceRegions(collection=sample_points, reducer=ee.Reducer.first().forEachBand(map_image)) \
         .map(lambda f: f.select(['actual', 'pred']))
     confusion_matrix = sampled_region.errorMatrix(actual="actual", predicted="pred")
-    print(f"Confusion matrix: {confusion_matrix.getInfo()}")
-    print(f"Kappa: {confusion_matrix.kappa().getInfo()}")
-    print(f"Accuracy: {confusion_matrix.accuracy().getInfo()}")
+    print(f"Confusion matrix: {profiler.get_info(confusion_matrix, 'confusion matrix')}")
+    print(f"Kappa: {profiler.get_info(confusion_matrix.kappa(), 'kappa')}")
+    print(f"Accuracy: {profiler.get_info(confusion_matrix.accuracy(), 'accuracy')}")
     print("-----")
 
 
@@ -22,7 +23,8 @@ def assess_cropland_model_only():
         .select(["b1", "TLABEL"], ["pred", "actual"])
     print("Cropland model assessment (Elle)")
     cl_mask = ee.Image(f'{base_asset_directory}/CLMask')
-    assess_combined_map(cropland_map.mask(cl_mask))
+    with profiler.span("assess", stage="assessor", what="cropland model"):
+        assess_combined_map(cropland_map.mask(cl_mask))
 
 
 def assess_timestationary_model_only():
@@ -30,7 +32,8 @@ def assess_timestationary_model_only():
         .addBands(ee.Image(f"{base_asset_directory}/s2005tlabels")) \
         .select(["classification", "TLABEL"], ["pred", "actual"])
     print("Time-stationary model assessment (Deepak)")
-    assess_combined_map(ts_map)
+    with profiler.span("assess", stage="assessor", what="time-stationary model"):
+        assess_combined_map(ts_map)
 
 
 def assess_model_results():
@@ -38,7 +41,8 @@ def assess_model_results():
     assess_cropland_model_only()
     assess_timestationary_model_only()
     print("Combined model assessment")
-    assess_combined_map(final_map)
+    with profiler.span("assess", stage="assessor", what="combined model"):
+        assess_combined_map(final_map)
 
 
 if __name__ == '__main__':
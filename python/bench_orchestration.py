@@ -0,0 +1,149 @@
+# Benchmarks the Python side of the pipeline against the offline GEE stand-in (offline_ee.py), no cloud access needed
+# For each entry point it measures graph construction time, request payload size, round trips to GEE and
+# wall time including the (simulated) wait for tasks.  Results can be saved and compared against a baseline:
+#   python3 bench_orchestration.py --save bench_orchestration_baseline.json
+#   python3 bench_orchestration.py --compare bench_orchestration_baseline.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+
+import offline_ee
+
+offline_ee.install()
+
+import common  # noqa: E402  (must come after install(), so that `import ee` gets the stand-in)
+import classifier  # noqa: E402
+import features_exporter  # noqa: E402
+import post_processor  # noqa: E402
+import profiler  # noqa: E402
+import run  # noqa: E402
+import sampler  # noqa: E402
+
+# Simulated task latency; kept small so that the whole suite runs in seconds
+queue_latency = 0.01
+run_latency = 0.02
+repeats = 5
+# Timings are noisy; sizes and round trips are deterministic and must not grow at all
+time_regression_ratio = 1.5
+time_regression_min_seconds = 0.005
+model_years = [str(year) for year in range(2001, 2016)]
+
+
+def new_backend(with_samples=True, with_features=False):
+    # Tracks only our own outputs, so inputs like the cropland maps are assumed to exist
+    assets = set()
+    if with_samples:
+        assets.add(f"{common.base_asset_directory}/samples{common.num_samples}_seed{common.train_seed}")
+        assets.add(f"{common.base_asset_directory}/samples{common.num_samples}_seed{common.assess_seed}")
+    if with_features:
+        assets.update(f"{common.model_snapshot_path_prefix}_features_{year}" for year in model_years)
+    tracked = (f"{common.base_asset_directory}/samples", f"{common.model_snapshot_path_prefix}_")
+    return offline_ee.install(offline_ee.OfflineBackend(queue_latency=queue_latency, run_latency=run_latency,
+                                                        assets=assets, tracked_asset_prefixes=tracked))
+
+
+def measure(name, fn, **backend_options):
+    # Best of `repeats` for time; counters come from the last run (they are the same every run)
+    best = None
+    for _ in range(repeats):
+        current_backend = new_backend(**backend_options)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    summary = current_backend.summary()
+    graph_bytes = offline_ee.serialized_size(result) if isinstance(result, offline_ee.Node) else None
+    # Status polls depend on timing, so they are kept apart from the requests the code makes
+    round_trips = dict(summary["round_trips"])
+    status_polls = round_trips.pop("getTaskStatus", 0)
+    payload_bytes = dict(summary["payload_bytes"])
+    payload_bytes.pop("getTaskStatus", None)
+    return dict(name=name, seconds=best, graph_bytes=graph_bytes, payload_bytes=sum(payload_bytes.values()),
+                round_trips=sum(round_trips.values()), round_trips_by_kind=round_trips, status_polls=status_polls,
+                nodes_built=summary["nodes_built"], tasks=summary["tasks"])
+
+
+def benchmarks():
+    trained = {}
+
+    def build_model():
+        trained["classifier"] = classifier.build_worldwide_model()
+        return trained["classifier"]
+
+    return [
+        # graph construction only
+        ("graph: selected features", lambda: common.get_selected_features_image("2005"), {}),
+        ("graph: classifier", build_model, {}),
+        ("graph: combined map", lambda: post_processor.combine_maps(2005), {}),
+        ("graph: combined probability map", lambda: post_processor.combine_probability_maps(2005), {}),
+        # orchestration, including round trips and waiting for tasks
+        ("sampler: create sample", lambda: sampler.get_or_create_worldwide_sample_points(common.train_seed),
+         dict(with_samples=False)),
+        ("features_exporter.main", features_exporter.main, {}),
+        ("classifier.classify_year", lambda: classifier.classify_year(trained["classifier"], "2005"),
+         dict(with_features=True)),
+        ("classifier.main", classifier.main, dict(with_features=True)),
+        ("post_processor.main", post_processor.main, {}),
+        ("run.main", lambda: run.main(model_years), {}),
+    ]
+
+
+def run_benchmarks():
+    common.task_poll_interval = run_latency / 4
+    profiler.trace_path = os.devnull
+    return [measure(name, fn, **options) for name, fn, options in benchmarks()]
+
+
+def report(results):
+    print(f"{'benchmark':<34} {'ms':>9} {'graph KB':>9} {'payload KB':>11} {'trips':>6} {'polls':>6} "
+          f"{'nodes':>7} {'tasks':>6}")
+    for r in results:
+        graph_kb = f"{r['graph_bytes'] / 1024:.1f}" if r["graph_bytes"] is not None else "-"
+        print(f"{r['name']:<34} {r['seconds'] * 1000:>9.1f} {graph_kb:>9} {r['payload_bytes'] / 1024:>11.1f} "
+              f"{r['round_trips']:>6} {r['status_polls']:>6} {r['nodes_built']:>7} {r['tasks']:>6}")
+
+
+def compare(results, baseline):
+    baseline = {r["name"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        old = baseline.get(r["name"])
+        if old is None:
+            continue
+        if r["seconds"] > old["seconds"] * time_regression_ratio and \
+                r["seconds"] - old["seconds"] > time_regression_min_seconds:
+            regressions.append(f"{r['name']}: {old['seconds'] * 1000:.1f} ms -> {r['seconds'] * 1000:.1f} ms")
+        for metric in ["graph_bytes", "payload_bytes", "round_trips", "nodes_built"]:
+            if (r[metric] or 0) > (old[metric] or 0):
+                regressions.append(f"{r['name']}: {metric} {old[metric]} -> {r[metric]}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regression(s) against baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline orchestration offline")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against results saved earlier")
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+# Benchmarks local raster workloads on synthetic global grids, to know what higher resolution will cost
+# Grids match the model grid (4320x2160 in EPSG:4326) and multiples of it.  Each workload runs in a fresh
+# process.  Peak memory is what the workload itself allocates (numpy reports its arrays to tracemalloc), not
+# counting the synthetic input data.  Results can be saved and compared:
+#   python3 bench_rasters.py --factors 1 2 --save bench_rasters_baseline.json
+#   python3 bench_rasters.py --factors 1 2 --compare bench_rasters_baseline.json
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import time
+import tracemalloc
+
+import numpy as np
+
+import sparse_maps
+from raster_io import model_grid, num_classes
+
+repeats = 3
+min_total_seconds = 0.5
+num_years = 15
+num_zones = 15
+num_points = 20000          # same as common.num_samples
+irrigated_fraction = 0.025  # roughly what the combined maps have
+missing_value = -9999       # as in common.dataset_list
+# Throughput must not drop below this fraction of the baseline, peak memory must not grow past this ratio
+throughput_regression_ratio = 0.67
+memory_regression_ratio = 1.2
+
+
+def synthetic_class_map(width, height, rng, fraction=irrigated_fraction):
+    # Irrigation comes in clusters, so threshold coarse noise rather than per-pixel noise
+    coarse = rng.random((height // 8, width // 8), dtype=np.float32)
+    clustered = np.repeat(np.repeat(coarse, 8, axis=0), 8, axis=1)
+    class_map = np.zeros((height, width), dtype=np.uint8)
+    class_map[clustered < fraction] = 1
+    class_map[clustered < fraction / 4] = 2
+    return class_map
+
+
+def synthetic_feature_band(width, height, rng):
+    band = rng.normal(0.3, 0.1, size=(height, width)).astype(np.float32)
+    band[: height // 6] = missing_value     # e.g. no data near the poles
+    return band
+
+
+def synthetic_zones(width, height):
+    # Vertical stripes standing in for world regions
+    return np.broadcast_to((np.arange(width) * num_zones // width).astype(np.uint8), (height, width))
+
+
+def setup_combine(width, height, transform, rng):
+    cropland = synthetic_class_map(width, height, rng)
+    cropland[cropland == 2] = 3   # the cropland maps use 3 instead of 2
+    non_cropland = synthetic_class_map(width, height, rng)
+    non_cl_mask = synthetic_class_map(width, height, rng, fraction=0.5) > 0
+    return cropland, non_cropland, non_cl_mask
+
+
+def run_combine(cropland, non_cropland, non_cl_mask):
+    # Same as post_processor.combine_maps(): blend() puts the non-cropland model on top where it has a class
+    # (inside its mask), and the cropland model shows through elsewhere
+    cropland = np.minimum(cropland, 2)
+    non_cropland = np.where(non_cl_mask, non_cropland, 0)
+    return np.where(non_cropland > 0, non_cropland, cropland)
+
+
+def setup_confusion_matrix(width, height, transform, rng):
+    actual = synthetic_class_map(width, height, rng)
+    predicted = actual.copy()
+    flip = rng.random((height, width), dtype=np.float32) < 0.05
+    predicted[flip] = rng.integers(0, num_classes, size=int(flip.sum()), dtype=np.uint8)
+    return actual, predicted
+
+
+def run_confusion_matrix(actual, predicted):
+    # As in assessor.py (errorMatrix, kappa, accuracy), but over every pixel
+    pairs = actual.astype(np.intp) * num_classes + predicted
+    matrix = np.bincount(pairs.ravel(), minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+    total = matrix.sum()
+    accuracy = np.trace(matrix) / total
+    expected = (matrix.sum(axis=0) * matrix.sum(axis=1)).sum() / total ** 2
+    return matrix, (accuracy - expected) / (1 - expected)
+
+
+def setup_zonal_sums(width, height, transform, rng):
+    class_map = synthetic_class_map(width, height, rng)
+    pixel_area = sparse_maps.SparseMap([], [], width, height, transform).pixel_area_ha_by_row()
+    return class_map, synthetic_zones(width, height), pixel_area
+
+
+def run_zonal_sums(class_map, zones, pixel_area):
+    # Irrigated hectares per zone
+    weights = (class_map > 0) * pixel_area[:, None]
+    return np.bincount(zones.ravel(), weights=weights.ravel(), minlength=num_zones)
+
+
+def setup_point_lookups(width, height, transform, rng):
+    lons = rng.uniform(-180, 180, num_points)
+    lats = rng.uniform(-90, 90, num_points)
+    return synthetic_class_map(width, height, rng), transform, lons, lats
+
+
+def run_point_lookups(class_map, transform, lons, lats):
+    # Like sampleRegions() on the sample points
+    cols = np.clip(((lons - transform.c) / transform.a).astype(np.intp), 0, class_map.shape[1] - 1)
+    rows = np.clip(((lats - transform.f) / transform.e).astype(np.intp), 0, class_map.shape[0] - 1)
+    return class_map[rows, cols]
+
+
+def setup_feature_stats(width, height, transform, rng):
+    return synthetic_feature_band(width, height, rng), synthetic_zones(width, height)
+
+
+def run_feature_stats(band, zones):
+    # Per-zone mean of a feature band, skipping missingValues
+    valid = band != missing_value
+    sums = np.bincount(zones[valid], weights=band[valid], minlength=num_zones)
+    counts = np.bincount(zones[valid], minlength=num_zones)
+    return sums / np.maximum(counts, 1)
+
+
+def setup_change_dense(width, height, transform, rng):
+    return [synthetic_class_map(width, height, rng) for _ in range(num_years)],
+
+
+def run_change_dense(class_maps):
+    # Gained / lost / persistent between first and last year, and how many years each pixel was irrigated
+    first, last = class_maps[0] > 0, class_maps[-1] > 0
+    frequency = np.zeros(first.shape, dtype=np.uint8)
+    for class_map in class_maps:
+        frequency += class_map > 0
+    return (last & ~first).sum(), (first & ~last).sum(), (first & last).sum(), frequency
+
+
+def setup_change_sparse(width, height, transform, rng):
+    return [sparse_maps.SparseMap.from_dense(synthetic_class_map(width, height, rng), transform)
+            for _ in range(num_years)],
+
+
+def run_change_sparse(series):
+    first, last = series[0], series[-1]
+    return (len(sparse_maps.gained(first, last)), len(sparse_maps.lost(first, last)),
+            len(sparse_maps.persistent(first, last)), sparse_maps.irrigation_frequency(series))
+
+
+# name -> (setup, run, number of items processed on a width x height grid); items are input pixels,
+# except for point lookups where they are points
+workloads = {
+    "combine": (setup_combine, run_combine, lambda width, height: 3 * width * height),
+    "confusion_matrix": (setup_confusion_matrix, run_confusion_matrix, lambda width, height: 2 * width * height),
+    "zonal_sums": (setup_zonal_sums, run_zonal_sums, lambda width, height: width * height),
+    "point_lookups": (setup_point_lookups, run_point_lookups, lambda width, height: num_points),
+    "feature_stats": (setup_feature_stats, run_feature_stats, lambda width, height: width * height),
+    "change_dense": (setup_change_dense, run_change_dense, lambda width, height: num_years * width * height),
+    "change_sparse": (setup_change_sparse, run_change_sparse, lambda width, height: num_years * width * height),
+}
+
+
+def workload_peak_mb(run, data):
+    # Separate from the timed runs, since tracing allocations slows them down
+    tracemalloc.start()
+    try:
+        run(*data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run_workload(name, factor):
+    width, height, transform = model_grid(factor)
+    setup, run, items = workloads[name]
+    data = setup(width, height, transform, np.random.default_rng(0))
+    # Best of at least `repeats` runs; fast workloads repeat for longer so that the timer isn't all noise
+    timings = []
+    while len(timings) < repeats or sum(timings) < min_total_seconds:
+        start = time.perf_counter()
+        run(*data)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return dict(name=name, factor=factor, grid=f"{width}x{height}", seconds=best,
+                items_per_second=items(width, height) / best, peak_mb=workload_peak_mb(run, data))
+
+
+def run_benchmarks(names, factors):
+    # A fresh process per workload, so one workload's leftovers can't affect the next
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for factor in factors:
+        for name in names:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(run_workload, name, factor).result())
+    return results
+
+
+def report(results):
+    print(f"{'workload':<18} {'grid':>10} {'ms':>10} {'Mitems/s':>11} {'peak MB':>9}")
+    for r in results:
+        print(f"{r['name']:<18} {r['grid']:>10} {r['seconds'] * 1000:>10.1f} {r['items_per_second'] / 1e6:>11.1f} "
+              f"{r['peak_mb']:>9.0f}")
+
+
+def compare(results, baseline):
+    baseline = {(r["name"], r["factor"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = baseline.get((r["name"], r["factor"]))
+        if old is None:
+            continue
+        if r["items_per_second"] < old["items_per_second"] * throughput_regression_ratio:
+            regressions.append(f"{r['name']} {r['grid']}: {old['items_per_second'] / 1e6:.1f} -> "
+                               f"{r['items_per_second'] / 1e6:.1f} Mitems/s")
+        if "peak_mb" in old and r["peak_mb"] > old["peak_mb"] * memory_regression_ratio:
+            regressions.append(f"{r['name']} {r['grid']}: peak {old['peak_mb']:.0f} -> {r['peak_mb']:.0f} MB")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regression(s) against baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local raster workloads on synthetic global grids")
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2],
+                        help="grid sizes as multiples of the model grid (1 = 4320x2160, 2 = 8640x4320)")
+    parser.add_argument("--workloads", nargs="+", default=list(workloads), choices=list(workloads))
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against results saved earlier")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.workloads, args.factors)
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
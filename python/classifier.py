@@ -4,8 +4,10 @@
 
 import ee
 
+import profiler
 from common import (model_scale, wait_for_task_completion, get_selected_features_image, model_snapshot_path_prefix,
-                    get_selected_features, model_projection, num_samples, train_seed)
+                    get_selected_features, model_projection, num_samples, train_seed, probability_bands,
+                    probability_scale)
 from sampler import get_or_create_worldwide_sample_points
 
 
@@ -15,9 +17,9 @@ def assess_model(classifier, test_partition):
     # Get a confusion matrix representing expected accuracy.
     if classifier.mode() != 'PROBABILITY':
         validation_matrix = validated.errorMatrix('TLABEL', 'classification')
-        print('Validation error matrix: ', validation_matrix.getInfo())
-        print('Validation accuracy: ', validation_matrix.accuracy().getInfo())
-        print('Validation kappa: ', validation_matrix.kappa().getInfo())
+        print('Validation error matrix: ', profiler.get_info(validation_matrix, 'validation error matrix'))
+        print('Validation accuracy: ', profiler.get_info(validation_matrix.accuracy(), 'validation accuracy'))
+        print('Validation kappa: ', profiler.get_info(validation_matrix.kappa(), 'validation kappa'))
 
 
 def train_model(training_partition, feature_list):
@@ -83,46 +85,66 @@ def create_classifier(features_image, labels_image, sample_points):
     # Model times out: uncomment if you like
     # if labels_image is not None:
     #     assess_model(classifier, split['test_partition'])
-    # GEE doesn't allow us to save a model so we always train the model
-    # classifier = classifier.setOutputMode('PROBABILITY')
-    # classifier = train_model(split['training_partition'], feature_list)
+    # For per-class probabilities instead of hard classes, see classify_year(output_mode='PROBABILITY')
     return classifier
 
 
 def build_worldwide_model():
-    sample_points = get_or_create_worldwide_sample_points(train_seed)
-    training_image = ee.Image(f"{model_snapshot_path_prefix}_training_sample{num_samples}_all_features_labels_image")
-    features_list = get_selected_features()
-    features_image = training_image.select(features_list)
-    labels_image = training_image.select("TLABEL")
-    classifier = create_classifier(features_image, labels_image, sample_points)
+    with profiler.span("build_worldwide_model", stage="classifier"):
+        sample_points = get_or_create_worldwide_sample_points(train_seed)
+        with profiler.span("build_graph", what="classifier"):
+            training_image = ee.Image(
+                f"{model_snapshot_path_prefix}_training_sample{num_samples}_all_features_labels_image")
+            features_list = get_selected_features()
+            features_image = training_image.select(features_list)
+            labels_image = training_image.select("TLABEL")
+            classifier = create_classifier(features_image, labels_image, sample_points)
     return classifier
 
 
-def classify_year(classifier, model_year):
-    asset_description = f'results_{model_year}'
+def quantize_probabilities(probabilities_image):
+    # float32 probabilities would make exports 4x larger; a byte per class is plenty for thresholding
+    return probabilities_image \
+        .arrayFlatten([probability_bands]) \
+        .multiply(probability_scale) \
+        .round() \
+        .toUint8() \
+        .set('probability_scale', probability_scale)
+
+
+def classify_year(classifier, model_year, output_mode='CLASSIFICATION'):
+    assert output_mode in ['CLASSIFICATION', 'PROBABILITY'], "Specify output mode: CLASSIFICATION or PROBABILITY"
+    if output_mode == 'PROBABILITY':
+        asset_description = f'probabilities_{model_year}'
+    else:
+        asset_description = f'results_{model_year}'
     asset_name = f'{model_snapshot_path_prefix}_{asset_description}'
-    features_image = get_selected_features_image(model_year)
-    classified_image = features_image.classify(classifier)
-    task = ee.batch.Export.image.toAsset(
-        image=classified_image,
-        description=asset_description,
-        assetId=asset_name,
-        crs=model_projection,
-        # default is 1000: don't want this!
-        scale=model_scale
-    )
-    task.start()
+    with profiler.span("classify_year", stage="classifier", year=str(model_year)):
+        features_image = get_selected_features_image(model_year)
+        if output_mode == 'PROBABILITY':
+            probabilities_image = features_image.classify(classifier.setOutputMode('MULTIPROBABILITY'))
+            classified_image = quantize_probabilities(probabilities_image)
+        else:
+            classified_image = features_image.classify(classifier)
+        task = ee.batch.Export.image.toAsset(
+            image=classified_image,
+            description=asset_description,
+            assetId=asset_name,
+            crs=model_projection,
+            # default is 1000: don't want this!
+            scale=model_scale
+        )
+        profiler.start_task(task, stage="classifier")
     return task
 
 
-def main():
+def main(output_mode='CLASSIFICATION'):
     ee.Initialize()
     classifier = build_worldwide_model()
     model_years = range(2001, 2016)
     tasks = []
     for year in model_years:
-        task = classify_year(classifier, year)
+        task = classify_year(classifier, year, output_mode)
         tasks.append(task)
     wait_for_task_completion(tasks)
 
@@ -4,6 +4,8 @@ import datetime
 
 import ee
 
+import profiler
+
 # Checklist when changing model:
 # 1. Update model_snapshot_version below
 # 2. Change selectedBands in dataset_list[] if your feature list is different
@@ -17,6 +19,7 @@ import ee
 # v3a: add back MCD12Q2.006, because kappa became 0.47
 #  - abandoned because other features were lost
 model_snapshot_version = "post_mids_v3b"
+profiler.snapshot_version = model_snapshot_version
 # Create this directory ahead of time
 base_asset_directory = "users/deepakna/w210_irrigated_croplands"
 
@@ -26,6 +29,8 @@ num_samples = 20000
 
 # label file
 label_path = f"{base_asset_directory}/s2005tlabels"
+# Label rasters from label_builder.py are staged here for upload; create this bucket ahead of time
+label_upload_bucket = "gs://w210_irrigated_croplands"
 # label year
 label_year = '2005'
 
@@ -106,6 +111,14 @@ world_regions_2 = [
 model_scale = 9276.620522123105      # 5 arc min at equator
 model_image_dimensions = "4320x2160"
 
+# How often wait_for_task_completion() polls GEE for task status
+task_poll_interval = 10  # seconds
+
+# Probability output mode: one band per class (TLABEL value), stored as uint8 where p = value / probability_scale
+class_labels = [0, 1, 2]
+probability_bands = [f"prob_{label}" for label in class_labels]
+probability_scale = 255
+
 
 def get_features_from_dataset(dataset, which, model_year, region_fc):
     assert which in ['all', 'selected'], "Specify which bands to get: all or selected"
@@ -194,25 +207,31 @@ def region_boundaries(region):
     return fc.map(lambda f: f.set("areaHa", f.geometry().area()))
 
 
-def wait_for_task_completion(tasks, exit_if_failures=False):
-    sleep_time = 10  # seconds
+def wait_for_task_completion(tasks, exit_if_failures=False, stage=None):
+    # The wait is attributed to the stage the tasks were submitted under, unless given
     done = False
     failed_tasks = []
-    while not done:
-        failed = 0
-        completed = 0
-        for t in tasks:
-            status = t.status()
-            print(f"{status['description']}: {status['state']}")
-            if status['state'] == 'COMPLETED':
-                completed += 1
-            elif status['state'] in ['FAILED', 'CANCELLED']:
-                failed += 1
-                failed_tasks.append(status)
-        if completed + failed == len(tasks):
-            print(f"All tasks processed in batch: {completed} completed, {failed} failed")
-            done = True
-        time.sleep(sleep_time)
+    recorded_task_ids = set()
+    stage = stage or profiler.task_stage(tasks)
+    with profiler.span("wait", num_tasks=len(tasks), **({"stage": stage} if stage else {})):
+        while not done:
+            failed = 0
+            completed = 0
+            for t in tasks:
+                status = t.status()
+                print(f"{status['description']}: {status['state']}")
+                if status['state'] == 'COMPLETED':
+                    completed += 1
+                elif status['state'] in ['FAILED', 'CANCELLED']:
+                    failed += 1
+                    failed_tasks.append(status)
+                if status['state'] in ['COMPLETED', 'FAILED', 'CANCELLED'] and status['id'] not in recorded_task_ids:
+                    profiler.record_task_status(status)
+                    recorded_task_ids.add(status['id'])
+            if completed + failed == len(tasks):
+                print(f"All tasks processed in batch: {completed} completed, {failed} failed")
+                done = True
+            time.sleep(task_poll_interval)
     if failed_tasks:
         print("--- Summary: following tasks failed ---")
         for status in failed_tasks:
@@ -264,7 +283,8 @@ def get_selected_features_image(model_year):
 
     image_path = f"{model_snapshot_path_prefix}_features_{model_year}"
     try:
-        _ = ee.data.getAsset(image_path)   # Forces exception
+        with profiler.span("getAsset", what=image_path):
+            _ = ee.data.getAsset(image_path)   # Forces exception
         # No exception, load the image
         features_image = ee.Image(image_path)
         return features_image
@@ -272,9 +292,10 @@ def get_selected_features_image(model_year):
         print(f"could not read features image {image_path} (probably not created yet)")
 
     regions = ["world1", "world2"]
-    regional_features = list(map(get_selected_features_in_region, regions))
-    assert (len(regions) == 2)
-    one_image = ee.Image(regional_features[0]).blend(regional_features[1])
+    with profiler.span("build_graph", what="selected_features"):
+        regional_features = list(map(get_selected_features_in_region, regions))
+        assert (len(regions) == 2)
+        one_image = ee.Image(regional_features[0]).blend(regional_features[1])
     return one_image
 
 
@@ -292,7 +313,7 @@ def export_image_to_asset(image, asset_subpath):
         region=global_geometry,
         maxPixels=1E13,
     )
-    task.start()
+    profiler.start_task(task, stage=profiler.current_stage("export_asset"), asset=asset_subpath)
     return task
 
 
@@ -310,7 +331,7 @@ def export_image_to_drive(image, folder):
         # dimensions=model_image_dimensions,
         region=global_geometry
     )
-    task.start()
+    profiler.start_task(task, stage=profiler.current_stage("export_drive"), folder=folder)
     return task
 
 
@@ -328,5 +349,5 @@ def export_asset_table_to_drive(asset_id):
         description=folder,
         fileFormat='GeoJSON'
     )
-    task.start()
+    profiler.start_task(task, stage=profiler.current_stage("export_table"), asset=asset_id)
     wait_for_task_completion([task], True)
@@ -0,0 +1,125 @@
+# Downscales the 8km maps to a finer grid (e.g. 4km or 1km) using a vegetation index
+# Requires: a combined map (see post_processor.py) and, optionally, a vegetation index GeoTIFF on the fine grid
+#   (e.g. MODIS EVI exported with export_image_to_drive() at the target scale)
+# The 8km label is kept only on the parts of each 8km square that look like cropland, i.e. where the
+# smoothed vegetation index is above a threshold.  Without a vegetation index, it's a plain nearest-neighbour upscale.
+# Work happens in blocks on a process pool and is streamed to a tiled GeoTIFF, so memory depends on the
+# block size rather than the size of the globe.
+
+import concurrent.futures
+import os
+
+import numpy as np
+import rasterio
+
+from rasterio.windows import Window
+
+from raster_io import bounded_map, iter_windows, results_path, to_class_array
+
+# Output tiles are 256x256; keep block_size a multiple of this so that each block writes whole tiles
+tile_size = 256
+
+
+def box_mean(values, valid, radius):
+    # Mean over a (2 * radius + 1) square around each pixel, ignoring invalid pixels, using integral images
+    height, width = values.shape
+    sums = np.zeros((height + 1, width + 1))
+    counts = np.zeros((height + 1, width + 1))
+    sums[1:, 1:] = np.where(valid, values, 0).cumsum(axis=0, dtype=np.float64).cumsum(axis=1)
+    counts[1:, 1:] = valid.cumsum(axis=0).cumsum(axis=1)
+    r0 = np.clip(np.arange(height) - radius, 0, height)[:, None]
+    r1 = np.clip(np.arange(height) + radius + 1, 0, height)[:, None]
+    c0 = np.clip(np.arange(width) - radius, 0, width)[None, :]
+    c1 = np.clip(np.arange(width) + radius + 1, 0, width)[None, :]
+
+    def window_total(table):
+        return table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+
+    window_counts = window_total(counts)
+    return window_total(sums) / np.maximum(window_counts, 1), window_counts > 0
+
+
+def expand_window(window, halo, width, height):
+    row_off = max(window.row_off - halo, 0)
+    col_off = max(window.col_off - halo, 0)
+    row_end = min(window.row_off + window.height + halo, height)
+    col_end = min(window.col_off + window.width + halo, width)
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+def read_coarse_labels(coarse_path, window, factor):
+    # Nearest-neighbour upscale of the part of the coarse map under a fine-grid window
+    rows = np.arange(window.row_off, window.row_off + window.height) // factor
+    cols = np.arange(window.col_off, window.col_off + window.width) // factor
+    coarse_window = Window(cols[0], rows[0], cols[-1] - cols[0] + 1, rows[-1] - rows[0] + 1)
+    with rasterio.open(coarse_path) as dataset:
+        coarse = to_class_array(dataset.read(1, window=coarse_window))
+    return coarse[np.ix_(rows - rows[0], cols - cols[0])]
+
+
+def downscale_block(job):
+    window, coarse_path, vi_path, factor, vi_threshold, halo, width, height = job
+    if vi_path is None:
+        return window, read_coarse_labels(coarse_path, window, factor)
+
+    # Smoothing needs neighbours from adjacent blocks: read with a halo, then crop it off
+    expanded = expand_window(window, halo, width, height)
+    labels = read_coarse_labels(coarse_path, expanded, factor)
+    with rasterio.open(vi_path) as dataset:
+        vi = dataset.read(1, window=expanded)
+        nodata = dataset.nodata
+    valid = ~np.isnan(vi) if np.issubdtype(vi.dtype, np.floating) else np.ones(vi.shape, dtype=bool)
+    if nodata is not None:
+        valid &= vi != nodata
+    smoothed_vi, has_vi = box_mean(vi, valid, halo)
+    labels = np.where(has_vi & (smoothed_vi >= vi_threshold), labels, 0).astype(np.uint8)
+
+    row_start = window.row_off - expanded.row_off
+    col_start = window.col_off - expanded.col_off
+    return window, labels[row_start:row_start + window.height, col_start:col_start + window.width]
+
+
+def downscale(coarse_path, output_path, factor, vi_path=None, vi_threshold=0.0, halo=2, block_size=1024,
+              max_workers=None):
+    assert block_size % tile_size == 0, f"block_size must be a multiple of {tile_size}"
+    with rasterio.open(coarse_path) as coarse:
+        profile = coarse.profile
+        width = coarse.width * factor
+        height = coarse.height * factor
+        transform = coarse.transform * coarse.transform.scale(1 / factor, 1 / factor)
+    if vi_path is not None:
+        with rasterio.open(vi_path) as vi:
+            assert (vi.width, vi.height) == (width, height), \
+                f"Vegetation index is {vi.width}x{vi.height}, expected {width}x{height}"
+
+    profile.update(
+        driver="GTiff",
+        dtype="uint8",
+        nodata=None,
+        width=width,
+        height=height,
+        transform=transform,
+        tiled=True,
+        blockxsize=tile_size,
+        blockysize=tile_size,
+        compress="lzw",
+        BIGTIFF="IF_SAFER",
+    )
+    max_workers = max_workers or os.cpu_count()
+    jobs = ((window, coarse_path, vi_path, factor, vi_threshold, halo, width, height)
+            for window in iter_windows(width, height, block_size))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            rasterio.open(output_path, "w", **profile) as output:
+        for window, block in bounded_map(executor, downscale_block, jobs, max_in_flight=2 * max_workers):
+            output.write(block, 1, window=window)
+    print(f"Wrote {width}x{height} map to {output_path}")
+
+
+def main():
+    # 8km -> 1km; point vi_path at an EVI export on the 1km grid to use the vegetation index
+    year = 2015
+    downscale(results_path(year), f"downscaled_{year}_1km.tif", factor=8)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+# Bulk QA of the feature stores and result maps, year by year
+# Each feature band and result map is streamed in windows into mergeable histogram sketches, per band,
+# per region and per year, on a process pool.  Memory stays bounded however many years there are.
+# Flags: distribution drift between consecutive years, jumps in missingValues (-9999) coverage, and
+# irrigated fractions that are implausible for a region (e.g. large parts of the Sahara).
+# Requires: feature stores and combined maps downloaded locally (common.export_image_to_drive()), see raster_io.py
+#   python3 feature_qa.py 2001 2002 ... 2015
+
+import argparse
+import concurrent.futures
+import glob
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import rasterio
+
+from raster_io import bbox_to_window, features_path, iter_windows, results_path
+
+missing_value = -9999   # as in common.dataset_list
+cache_directory = "qa_cache"
+block_size = 512
+
+# Regions as (west, south, east, north) boxes, with the largest fraction of land pixels we find plausible
+# as irrigated there (about 1.5x what the v3b maps have for 2001-2015)
+qa_regions = {
+    "world": ((-180, -90, 180, 90), 0.15),
+    "north_america": ((-170, 15, -50, 75), 0.13),
+    "south_america": ((-82, -56, -34, 13), 0.10),
+    "europe": ((-25, 35, 45, 72), 0.28),
+    "africa": ((-18, -35, 52, 37), 0.06),
+    "asia": ((45, -10, 150, 75), 0.27),
+    "australia": ((112, -44, 154, -10), 0.05),
+    # Excludes the Nile valley, which is irrigated
+    "sahara": ((-15, 18, 30, 30), 0.01),
+}
+
+# Population stability index above this means the distribution moved
+drift_psi_threshold = 0.25
+# Absolute change in the fraction of missing or irrigated pixels from one year to the next
+missing_jump_threshold = 0.05
+irrigated_jump_threshold = 0.02
+
+
+class HistogramSketch:
+    # Log-spaced buckets with relative accuracy `accuracy`: no range needs to be known up front, so sketches
+    # from different windows, workers or years can simply be added together
+    accuracy = 0.01
+    gamma = (1 + accuracy) / (1 - accuracy)
+    min_magnitude = 1e-9
+    key_offset = 4000   # keeps positive and negative bucket keys apart; |log_gamma(1e-9)| is about 1036
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.missing = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        is_missing = (values == missing_value) | np.isnan(values)
+        self.missing += int(is_missing.sum())
+        values = values[~is_missing]
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        magnitudes = np.abs(values)
+        keys = np.zeros(values.size, dtype=np.int64)
+        nonzero = magnitudes >= self.min_magnitude
+        indices = np.ceil(np.log(magnitudes[nonzero]) / math.log(self.gamma)).astype(np.int64) + self.key_offset
+        keys[nonzero] = np.where(values[nonzero] > 0, indices, -indices)
+        for key, count in zip(*np.unique(keys, return_counts=True)):
+            self.buckets[int(key)] = self.buckets.get(int(key), 0) + int(count)
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += other.count
+        self.missing += other.missing
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def bucket_value(self, key):
+        if key == 0:
+            return 0.0
+        magnitude = 2 * self.gamma ** (abs(key) - self.key_offset) / (self.gamma + 1)
+        return magnitude if key > 0 else -magnitude
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.buckets, key=self.bucket_value):
+            seen += self.buckets[key]
+            if seen > rank:
+                return min(max(self.bucket_value(key), self.minimum), self.maximum)
+        return self.maximum
+
+    def missing_fraction(self):
+        total = self.count + self.missing
+        return self.missing / total if total else 0.0
+
+    def to_dict(self):
+        return dict(buckets={str(k): v for k, v in self.buckets.items()}, count=self.count, missing=self.missing,
+                    minimum=self.minimum if self.count else None, maximum=self.maximum if self.count else None)
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.buckets = {int(k): v for k, v in data["buckets"].items()}
+        sketch.count = data["count"]
+        sketch.missing = data["missing"]
+        sketch.minimum = data["minimum"] if data["minimum"] is not None else math.inf
+        sketch.maximum = data["maximum"] if data["maximum"] is not None else -math.inf
+        return sketch
+
+
+def psi(expected, actual, buckets_per_group=2):
+    # Population stability index over groups of neighbouring buckets (about 2% wide each); counts are smoothed
+    # so that empty buckets don't blow up the log
+    if expected.count == 0 or actual.count == 0:
+        return 0.0
+    keys = sorted(set(expected.buckets) | set(actual.buckets), key=expected.bucket_value)
+    total = 0.0
+    for start in range(0, len(keys), buckets_per_group):
+        group = keys[start:start + buckets_per_group]
+        p = (sum(expected.buckets.get(k, 0) for k in group) + 0.5) / (expected.count + 0.5)
+        q = (sum(actual.buckets.get(k, 0) for k in group) + 0.5) / (actual.count + 0.5)
+        total += (q - p) * math.log(q / p)
+    return total
+
+
+def region_slices(window_transform, height, width, bbox):
+    # Rows and columns of a window that fall inside a region box, or None
+    try:
+        return bbox_to_window(window_transform, width, height, bbox).toslices()
+    except ValueError:
+        return None
+
+
+def sketch_features(path):
+    # {band: {region: sketch}} for one year's feature store
+    sketches = {}
+    with rasterio.open(path) as dataset:
+        band_names = [d or f"b{i + 1}" for i, d in enumerate(dataset.descriptions)]
+        for window in iter_windows(dataset.width, dataset.height, block_size):
+            data = dataset.read(window=window)
+            window_transform = dataset.window_transform(window)
+            for region, (bbox, _) in qa_regions.items():
+                slices = region_slices(window_transform, window.height, window.width, bbox)
+                if slices is None:
+                    continue
+                for band_name, band in zip(band_names, data):
+                    sketches.setdefault(band_name, {}).setdefault(region, HistogramSketch()).add(band[slices])
+    return sketches
+
+
+def irrigated_fractions(path):
+    # {region: [irrigated pixels, land pixels]} for one year's combined map; NaN is ocean
+    counts = {region: [0, 0] for region in qa_regions}
+    with rasterio.open(path) as dataset:
+        for window in iter_windows(dataset.width, dataset.height, block_size):
+            data = dataset.read(1, window=window)
+            window_transform = dataset.window_transform(window)
+            for region, (bbox, _) in qa_regions.items():
+                slices = region_slices(window_transform, window.height, window.width, bbox)
+                if slices is None:
+                    continue
+                block = data[slices]
+                land = ~np.isnan(block) if np.issubdtype(block.dtype, np.floating) else np.ones(block.shape, bool)
+                counts[region][0] += int(np.count_nonzero((block > 0) & land))
+                counts[region][1] += int(np.count_nonzero(land))
+    return counts
+
+
+def qa_year(job):
+    # Runs in a worker; returns JSON-friendly results so they can be cached
+    kind, year, path = job
+    if kind == "features":
+        sketches = sketch_features(path)
+        return kind, year, {band: {region: s.to_dict() for region, s in regions.items()}
+                            for band, regions in sketches.items()}
+    return kind, year, irrigated_fractions(path)
+
+
+def config_digest():
+    # Everything that shapes the cached results; changing any of it invalidates the cache
+    config = dict(regions={region: bbox for region, (bbox, _) in qa_regions.items()}, block_size=block_size,
+                  missing_value=missing_value, accuracy=HistogramSketch.accuracy,
+                  min_magnitude=HistogramSketch.min_magnitude, key_offset=HistogramSketch.key_offset)
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def cache_path(kind, year, digest):
+    return os.path.join(cache_directory, f"{kind}_{year}_{digest}.json")
+
+
+def cached_qa(jobs, max_workers=None):
+    # Years whose GeoTIFF hasn't changed since the last run, under the same QA config, come from the cache.
+    # Each (kind, year) is one job on the pool.
+    digest = config_digest()
+    results = {}
+    pending = []
+    for kind, year, path in jobs:
+        current = cache_path(kind, year, digest)
+        for stale in glob.glob(cache_path(kind, year, "*")):
+            if stale != current:
+                os.remove(stale)
+        if os.path.exists(current) and os.path.getmtime(current) >= os.path.getmtime(path):
+            with open(current) as f:
+                results[(kind, year)] = json.load(f)
+        else:
+            pending.append((kind, year, path))
+    os.makedirs(cache_directory, exist_ok=True)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for kind, year, result in executor.map(qa_year, pending):
+            with open(cache_path(kind, year, digest), "w") as f:
+                json.dump(result, f)
+            results[(kind, year)] = result
+    return results
+
+
+def check_features(years, results):
+    flags = []
+    previous = None
+    for year in years:
+        if ("features", year) not in results:
+            continue
+        current = {band: {region: HistogramSketch.from_dict(s) for region, s in regions.items()}
+                   for band, regions in results[("features", year)].items()}
+        for band, regions in current.items():
+            for region, sketch in regions.items():
+                before = previous.get(band, {}).get(region) if previous else None
+                if before is None:
+                    continue
+                drift = psi(before, sketch)
+                if drift > drift_psi_threshold:
+                    flags.append(f"{year} {band} {region}: distribution drift (PSI {drift:.2f}, median "
+                                 f"{before.quantile(0.5):.4g} -> {sketch.quantile(0.5):.4g})")
+                jump = sketch.missing_fraction() - before.missing_fraction()
+                if abs(jump) > missing_jump_threshold:
+                    flags.append(f"{year} {band} {region}: missing values {before.missing_fraction():.1%} -> "
+                                 f"{sketch.missing_fraction():.1%}")
+        previous = current
+    return flags
+
+
+def check_results(years, results):
+    flags = []
+    previous = None
+    for year in years:
+        if ("results", year) not in results:
+            continue
+        fractions = {region: irrigated / land if land else 0.0
+                     for region, (irrigated, land) in results[("results", year)].items()}
+        for region, fraction in fractions.items():
+            _, max_fraction = qa_regions[region]
+            if fraction > max_fraction:
+                flags.append(f"{year} {region}: {fraction:.1%} irrigated, more than the plausible {max_fraction:.0%}")
+            if previous is not None and abs(fraction - previous[region]) > irrigated_jump_threshold:
+                flags.append(f"{year} {region}: irrigated fraction {previous[region]:.1%} -> {fraction:.1%}")
+        previous = fractions
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QA of feature stores and result maps across years")
+    parser.add_argument("years", nargs="*", default=[str(year) for year in range(2001, 2016)])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    jobs = []
+    for year in args.years:
+        for kind, path in [("features", features_path(year)), ("results", results_path(year))]:
+            if os.path.exists(path):
+                jobs.append((kind, year, path))
+            else:
+                print(f"Skipping {kind} for {year}: {path} not found")
+    results = cached_qa(jobs, args.workers)
+    flags = check_features(args.years, results) + check_results(args.years, results)
+    for flag in flags:
+        print(f"FLAG {flag}")
+    print(f"{len(flags)} flag(s) over {len(args.years)} year(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@
 
 import ee
 
+import profiler
 from common import (model_scale, wait_for_task_completion, get_selected_features_image, model_snapshot_path_prefix,
                     model_projection)
 
@@ -11,16 +12,17 @@ from common import (model_scale, wait_for_task_completion, get_selected_features
 def export_selected_features_for_year(model_year):
     asset_description = f'features_{model_year}'
     asset_name = f'{model_snapshot_path_prefix}_{asset_description}'
-    features_image = get_selected_features_image(model_year)
-    task = ee.batch.Export.image.toAsset(
-        image=features_image,
-        description=asset_description,
-        assetId=asset_name,
-        crs=model_projection,
-        # default is 1000: don't want this!
-        scale=model_scale
-    )
-    task.start()
+    with profiler.span("features_exporter", stage="features", year=str(model_year)):
+        features_image = get_selected_features_image(model_year)
+        task = ee.batch.Export.image.toAsset(
+            image=features_image,
+            description=asset_description,
+            assetId=asset_name,
+            crs=model_projection,
+            # default is 1000: don't want this!
+            scale=model_scale
+        )
+        profiler.start_task(task, stage="features")
     return task
 
 
@@ -0,0 +1,161 @@
+# Builds irrigation label rasters from the MIRCA2000 hectare raster for a whole sweep of thresholds
+# Thresholds are in log1p-hectares, as in the R notebook.  Binary labels are 1 at or above the threshold;
+# ternary labels (low, high) are 0 below low, 1 between low and high, and 2 at or above high.
+# The raster is read once and every variant comes out of one vectorized pass.  Variants are cached locally,
+# and only the ones that changed since the last upload are uploaded as GEE assets.
+#   python3 label_builder.py --binary 0.5 1 2 --ternary 1:3 1:5 [--upload]
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+
+import numpy as np
+import rasterio
+
+mirca_labels_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data",
+                                 "mc4MaxIrrigatedHaLabels.tif")
+cache_directory = "labels_cache"
+manifest_name = "manifest.json"
+label_band = "TLABEL"
+
+
+def hectare_cuts(thresholds):
+    # Hectares are integers, so log1p(ha) >= t  <=>  ha >= ceil(expm1(t)); no need to convert the raster to float
+    return np.ceil(np.expm1(np.asarray(thresholds, dtype=np.float64)) - 1e-9).astype(np.int64)
+
+
+def variant_name(kind, thresholds):
+    # Asset ids only allow letters, digits, '_' and '-'
+    return f"{kind}_" + "_".join(f"{t:g}".replace(".", "p") for t in thresholds)
+
+
+def build_label_variants(hectares, binary_thresholds=(), ternary_thresholds=()):
+    # Every pixel gets its level: how many of the (sorted, distinct) cuts it is at or above.  Each variant
+    # is then a comparison of the level against its cut's position, which is cheap.  Close thresholds can
+    # share a cut, so there are at most as many levels as distinct cuts.
+    all_thresholds = sorted(set(binary_thresholds) | {t for pair in ternary_thresholds for t in pair})
+    threshold_cuts = hectare_cuts(all_thresholds)
+    cuts = np.unique(threshold_cuts)
+    assert len(cuts) <= np.iinfo(np.uint16).max, f"Too many distinct thresholds: {len(cuts)}"
+    levels = np.searchsorted(cuts, hectares, side="right").astype(np.uint16)
+    position = {t: int(np.searchsorted(cuts, cut, side="right")) for t, cut in zip(all_thresholds, threshold_cuts)}
+
+    variants = {}
+    for threshold in binary_thresholds:
+        variants[variant_name("binary", [threshold])] = (levels >= position[threshold]).astype(np.uint8)
+    for low, high in ternary_thresholds:
+        assert low < high, f"Ternary thresholds must be increasing: {low}, {high}"
+        labels = (levels >= position[low]).astype(np.uint8)
+        labels += levels >= position[high]
+        variants[variant_name("ternary", [low, high])] = labels
+    return variants
+
+
+def read_hectares(path=mirca_labels_path):
+    with rasterio.open(path) as dataset:
+        return dataset.read(1), dataset.profile
+
+
+def digest(labels):
+    return hashlib.sha1(labels.tobytes()).hexdigest()
+
+
+def read_manifest():
+    path = os.path.join(cache_directory, manifest_name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest):
+    with open(os.path.join(cache_directory, manifest_name), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def cache_variants(variants, profile):
+    # Writes a GeoTIFF only when a variant is new or its labels changed; returns the manifest
+    os.makedirs(cache_directory, exist_ok=True)
+    manifest = read_manifest()
+    profile = dict(profile, dtype="uint8", count=1, nodata=None, compress="lzw", tiled=True,
+                   blockxsize=256, blockysize=256)
+    for name, labels in variants.items():
+        entry = manifest.setdefault(name, {})
+        labels_digest = digest(labels)
+        path = os.path.join(cache_directory, f"{name}.tif")
+        if entry.get("digest") == labels_digest and os.path.exists(path):
+            continue
+        with rasterio.open(path, "w", **profile) as dataset:
+            dataset.write(labels, 1)
+            dataset.set_band_description(1, label_band)
+        entry.update(digest=labels_digest, path=path)
+    write_manifest(manifest)
+    return manifest
+
+
+# Uploading needs earthengine-api; building and caching variants locally doesn't, so these import it lazily
+def label_asset_id(name):
+    from common import base_asset_directory
+    return f"{base_asset_directory}/labels_{name}"
+
+
+def upload_variant(name, path):
+    # Asset ingestion reads from Cloud Storage, so stage the file there first
+    import ee
+    from common import label_upload_bucket
+    gcs_uri = f"{label_upload_bucket}/labels/{os.path.basename(path)}"
+    subprocess.run(["gsutil", "cp", path, gcs_uri], check=True)
+    request = {
+        "name": f"projects/earthengine-legacy/assets/{label_asset_id(name)}",
+        "tilesets": [{"sources": [{"uris": [gcs_uri]}]}],
+        "bands": [{"id": label_band}],
+    }
+    task_id = ee.data.newTaskId()[0]
+    ee.data.startIngestion(task_id, request, allow_overwrite=True)
+    return ee.batch.Task(task_id, "INGEST_IMAGE", "READY")
+
+
+def upload_changed_variants(manifest, names):
+    changed = [name for name in names if manifest[name].get("uploaded_digest") != manifest[name]["digest"]]
+    print(f"Uploading {len(changed)} changed label variant(s), {len(names) - len(changed)} unchanged")
+    if not changed:
+        return
+    from common import wait_for_task_completion
+    tasks = [upload_variant(name, manifest[name]["path"]) for name in changed]
+    wait_for_task_completion(tasks, exit_if_failures=True, stage="label_upload")
+    for name in changed:
+        manifest[name]["uploaded_digest"] = manifest[name]["digest"]
+        manifest[name]["asset_id"] = label_asset_id(name)
+    write_manifest(manifest)
+
+
+def parse_ternary(value):
+    low, high = value.split(":")
+    return float(low), float(high)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build label rasters from MIRCA2000 for a sweep of thresholds")
+    parser.add_argument("--binary", type=float, nargs="*", default=[1.0],
+                        help="log1p-hectare thresholds for binary labels")
+    parser.add_argument("--ternary", type=parse_ternary, nargs="*", default=[],
+                        help="low:high log1p-hectare thresholds for ternary labels")
+    parser.add_argument("--upload", action="store_true", help="upload changed variants as GEE assets")
+    args = parser.parse_args()
+
+    hectares, profile = read_hectares()
+    variants = build_label_variants(hectares, args.binary, args.ternary)
+    manifest = cache_variants(variants, profile)
+    for name, labels in variants.items():
+        irrigated = np.count_nonzero(labels) / labels.size
+        print(f"{name}: {irrigated:.2%} of pixels labelled irrigated -> {manifest[name]['path']}")
+    if args.upload:
+        import ee
+        ee.Initialize()
+        upload_changed_variants(manifest, list(variants))
+
+
+if __name__ == '__main__':
+    main()
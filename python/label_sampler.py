@@ -1,5 +1,6 @@
 import ee
 
+import profiler
 from common import model_scale, wait_for_task_completion, model_projection
 from common import train_seed, label_path
 from sampler import get_or_create_worldwide_sample_points
@@ -21,7 +22,7 @@ def export_point_unbuffered(id: str, coords: list, folder: str) -> ee.batch.Task
     prefix = f"{id}"
     task = ee.batch.Export.image.toDrive(clipped_sat_image, folder=folder, scale=LANDSAT_RES,
                                          fileNamePrefix=prefix, region=square)
-    task.start()
+    profiler.start_task(task, stage="label_sampler")
     return task
 
 
@@ -44,9 +45,9 @@ if __name__ == '__main__':
             geometries=True,
             dropNulls=True
         )
-    print(labels_fc.size().getInfo())
+    print(profiler.get_info(labels_fc.size(), 'label sample size'))
 
-    labels_fc_info = labels_fc.getInfo()
+    labels_fc_info = profiler.get_info(labels_fc, 'label sample')
     tasks = list(map(
         lambda p: export_point_unbuffered(p['id'], p['geometry']['coordinates'], "classNotIrr_samples"),
         labels_fc_info['features']
@@ -0,0 +1,307 @@
+# Offline stand-in for the parts of the Earth Engine API (`ee`) that our scripts use
+# Nothing is computed: each call records a node in an expression graph, the same way the real client
+# library builds requests.  Round trips (getInfo, getAsset, task start/status) are counted, request payloads
+# are serialized to measure their size, and export tasks move through READY -> RUNNING -> COMPLETED/FAILED
+# with configurable latency and failures.  This lets us exercise and time the orchestration without GEE.
+#
+# Usage: call install() *before* importing any of the pipeline modules, so that their `import ee` picks it up:
+#   import offline_ee
+#   backend = offline_ee.install()
+#   import features_exporter
+
+import collections
+import itertools
+import json
+import random
+import sys
+import time
+import types
+
+
+class EEException(Exception):
+    pass
+
+
+ee_exception = types.SimpleNamespace(EEException=EEException)
+
+
+class OfflineBackend:
+    def __init__(self, queue_latency=0.0, run_latency=0.0, failure_rate=0.0, fail_descriptions=(), seed=0,
+                 assets=(), tracked_asset_prefixes=("users/", "projects/"), info_values=None):
+        self.queue_latency = queue_latency    # seconds a task stays READY
+        self.run_latency = run_latency        # seconds a task stays RUNNING
+        self.failure_rate = failure_rate
+        self.fail_descriptions = set(fail_descriptions)
+        self.random = random.Random(seed)
+        # Assets under tracked_asset_prefixes exist only if listed here (exports to asset add to it when they
+        # complete); anything else, like the public catalog, is assumed to exist
+        self.assets = set(assets)
+        self.tracked_asset_prefixes = tuple(tracked_asset_prefixes)
+        # Final function name -> value returned by getInfo(), see default_info_values
+        self.info_values = dict(default_info_values, **(info_values or {}))
+        self.round_trips = collections.Counter()
+        self.payload_bytes = collections.Counter()
+        self.nodes_built = 0
+        self.tasks = []
+        self._task_ids = itertools.count(1)
+
+    def round_trip(self, kind, payload=None):
+        self.round_trips[kind] += 1
+        if payload is not None:
+            self.payload_bytes[kind] += len(json.dumps(payload))
+
+    def asset_exists(self, asset_id):
+        return asset_id in self.assets or not asset_id.startswith(self.tracked_asset_prefixes)
+
+    def check_assets(self, value):
+        # Like GEE, referencing an asset that doesn't exist fails at getInfo() time
+        for asset_id in referenced_assets(value):
+            if not self.asset_exists(asset_id):
+                raise EEException(f"Asset '{asset_id}' not found.")
+
+    def get_info(self, node):
+        self.round_trip("getInfo", serialize(node))
+        self.check_assets(node)
+        value = self.info_values.get(node.func)
+        return value(node) if callable(value) else value
+
+    def get_asset(self, asset_id):
+        self.round_trip("getAsset", {"id": asset_id})
+        if not self.asset_exists(asset_id):
+            raise EEException(f"Asset '{asset_id}' not found.")
+        return {"type": "IMAGE", "id": asset_id}
+
+    def new_task_id(self):
+        return f"OFFLINE{next(self._task_ids):06d}"
+
+    def summary(self):
+        return dict(round_trips=dict(self.round_trips), payload_bytes=dict(self.payload_bytes),
+                    nodes_built=self.nodes_built, tasks=len(self.tasks))
+
+
+default_info_values = {
+    "aggregate_sum": 1.0e10,
+    "size": 0,
+    "limit": {"type": "FeatureCollection", "features": []},
+    "FeatureCollection": {"type": "FeatureCollection", "features": []},
+    "errorMatrix": [[0, 0, 0], [0, 0, 0], [0, 0, 0]],
+    "accuracy": 0.0,
+    "kappa": 0.0,
+}
+
+backend = OfflineBackend()
+
+
+def install(new_backend=None):
+    # Replaces `ee` for every module imported from now on; returns the backend for inspecting counters
+    global backend
+    backend = new_backend or OfflineBackend()
+    sys.modules["ee"] = sys.modules[__name__]
+    return backend
+
+
+class Node:
+    # One call in an expression graph: a constructor like ee.Image(...) or a method call on another node
+    def __init__(self, func, args=(), kwargs=None, base=None):
+        self.func = func
+        self.base = base
+        self.args = [to_graph_value(a) for a in args]
+        self.kwargs = {k: to_graph_value(v) for k, v in (kwargs or {}).items()}
+        backend.nodes_built += 1
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: Node(name, args, kwargs, base=self)
+
+    def getInfo(self):
+        return backend.get_info(self)
+
+
+class Function:
+    # Python callables passed to map() etc. are called once with placeholder arguments, as the real client does.
+    # Placeholders are named after the nesting depth, so the same code always gives the same graph.
+    depth = 0
+
+    def __init__(self, fn):
+        self.arg_names = [f"_MAPPING_VAR_{Function.depth}_0"]
+        Function.depth += 1
+        try:
+            self.body = to_graph_value(fn(Node("variable", kwargs={"name": self.arg_names[0]})))
+        finally:
+            Function.depth -= 1
+
+
+def to_graph_value(value):
+    if callable(value) and not isinstance(value, (Node, ObjectType)):
+        return Function(value)
+    if isinstance(value, (list, tuple)):
+        return [to_graph_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_graph_value(v) for k, v in value.items()}
+    return value
+
+
+class ObjectType:
+    # ee.Image, ee.FeatureCollection, ...: calling it constructs, attributes are static functions (ee.Image.cat)
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        return Node(self.name, args, kwargs)
+
+    def __getattr__(self, func):
+        if func.startswith("__"):
+            raise AttributeError(func)
+        return lambda *args, **kwargs: Node(f"{self.name}.{func}", args, kwargs)
+
+
+Image = ObjectType("Image")
+ImageCollection = ObjectType("ImageCollection")
+Feature = ObjectType("Feature")
+FeatureCollection = ObjectType("FeatureCollection")
+Filter = ObjectType("Filter")
+Reducer = ObjectType("Reducer")
+Classifier = ObjectType("Classifier")
+Geometry = ObjectType("Geometry")
+List = ObjectType("List")
+Number = ObjectType("Number")
+
+
+def Initialize(*args, **kwargs):
+    backend.round_trip("initialize")
+
+
+def referenced_assets(value):
+    # Asset ids given to constructors, e.g. ee.Image("users/...")
+    stack = [value]
+    seen = set()
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, Node):
+            if value.base is None and value.args and isinstance(value.args[0], str):
+                yield value.args[0]
+            stack.extend(value.args)
+            stack.extend(value.kwargs.values())
+            if value.base is not None:
+                stack.append(value.base)
+        elif isinstance(value, Function):
+            stack.append(value.body)
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+
+
+def serialize(value):
+    # Compact encoding like the real client's: every distinct sub-expression is stored once and referenced
+    values = {}
+    refs_by_encoding = {}
+    refs_by_id = {}
+    keep_alive = []
+
+    def encode(value):
+        if isinstance(value, Node):
+            if id(value) not in refs_by_id:
+                arguments = {str(i): encode(a) for i, a in enumerate(value.args)}
+                arguments.update({k: encode(v) for k, v in value.kwargs.items()})
+                if value.base is not None:
+                    arguments["this"] = encode(value.base)
+                invocation = {"functionInvocationValue": {"functionName": value.func, "arguments": arguments}}
+                key = json.dumps(invocation, sort_keys=True)
+                if key not in refs_by_encoding:
+                    refs_by_encoding[key] = str(len(refs_by_encoding))
+                    values[refs_by_encoding[key]] = invocation
+                refs_by_id[id(value)] = refs_by_encoding[key]
+                keep_alive.append(value)
+            return {"valueReference": refs_by_id[id(value)]}
+        if isinstance(value, Function):
+            return {"functionDefinitionValue": {"argumentNames": value.arg_names, "body": encode(value.body)}}
+        if isinstance(value, list):
+            return {"arrayValue": {"values": [encode(v) for v in value]}}
+        if isinstance(value, dict):
+            return {"dictionaryValue": {"values": {k: encode(v) for k, v in value.items()}}}
+        return {"constantValue": value}
+
+    result = encode(value)
+    return {"result": result, "values": values}
+
+
+def serialized_size(value):
+    return len(json.dumps(serialize(value)))
+
+
+class Task:
+    def __init__(self, task_type, description, payload, asset_id=None):
+        self.task_type = task_type
+        self.config = payload
+        self.description = description
+        self.asset_id = asset_id
+        self.id = None
+        self.state = "UNSUBMITTED"
+        self.creation_time = None
+        self.will_fail = False
+        self._final_status = None
+
+    def start(self):
+        backend.round_trip("startProcessing", serialize(self.config))
+        self.id = backend.new_task_id()
+        self.creation_time = time.time()
+        self.will_fail = self.description in backend.fail_descriptions or \
+            backend.random.random() < backend.failure_rate
+        backend.tasks.append(self)
+
+    def status(self):
+        backend.round_trip("getTaskStatus", {"id": self.id})
+        if self._final_status:
+            return dict(self._final_status)
+        now = time.time()
+        elapsed = now - self.creation_time
+        status = {"id": self.id, "description": self.description, "task_type": self.task_type,
+                  "creation_timestamp_ms": int(self.creation_time * 1000), "update_timestamp_ms": int(now * 1000)}
+        if elapsed < backend.queue_latency:
+            status["state"] = "READY"
+            return status
+        status["start_timestamp_ms"] = int((self.creation_time + backend.queue_latency) * 1000)
+        if elapsed < backend.queue_latency + backend.run_latency:
+            status["state"] = "RUNNING"
+            return status
+        if self.will_fail:
+            status.update(state="FAILED", error_message="Simulated failure")
+        else:
+            status.update(state="COMPLETED", batch_eecu_usage_seconds=backend.run_latency)
+            if self.asset_id:
+                backend.assets.add(self.asset_id)
+        self._final_status = status
+        return dict(status)
+
+
+def _export(task_type, payload_name):
+    # The image/collection may be passed positionally or by keyword, as in the real API
+    def export(*args, **config):
+        if args:
+            config[payload_name] = args[0]
+        description = config.get("description", "myExportTask")
+        return Task(task_type, description, config, asset_id=config.get("assetId"))
+    return export
+
+
+batch = types.SimpleNamespace(
+    Task=Task,
+    Export=types.SimpleNamespace(
+        image=types.SimpleNamespace(toAsset=_export("EXPORT_IMAGE", "image"),
+                                    toDrive=_export("EXPORT_IMAGE", "image")),
+        table=types.SimpleNamespace(toAsset=_export("EXPORT_FEATURES", "collection"),
+                                    toDrive=_export("EXPORT_FEATURES", "collection")),
+    ),
+)
+
+
+def _get_asset(asset_id):
+    return backend.get_asset(asset_id)
+
+
+data = types.SimpleNamespace(getAsset=_get_asset)
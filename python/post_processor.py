@@ -1,6 +1,8 @@
 import ee
+
+import profiler
 from common import base_asset_directory, region_boundaries, export_image_to_drive, wait_for_task_completion, \
-    model_snapshot_version
+    model_snapshot_version, class_labels, probability_bands, probability_scale
 
 
 def combine_maps(year):
@@ -17,12 +19,42 @@ def combine_maps(year):
     return combined_image
 
 
-def main():
+def combine_probability_maps(year):
+    # Same as combine_maps(), but for maps from classify_year(output_mode='PROBABILITY')
+    cropland_image = ee.Image(f"users/deepakna/ellecp/v3/{year}_ternary")
+    non_cropland_image = ee.Image(f"{base_asset_directory}/{model_snapshot_version}_probabilities_{year}")
+    non_cl_mask = ee.Image(f"{base_asset_directory}/nonCLMask")
+    non_cropland_image = non_cropland_image.mask(non_cl_mask)
+    cropland_image = cropland_image.expression("classification = b(0) > 2 ? 2 : b(0)")
+    # The cropland model only gives us hard classes: treat them as certain
+    cropland_probabilities = ee.Image.cat(*[cropland_image.eq(label).multiply(probability_scale)
+                                            for label in class_labels]) \
+        .rename(probability_bands) \
+        .toUint8()
+    not_irrigated = ee.Image.constant([probability_scale if label == 0 else 0 for label in class_labels]) \
+        .rename(probability_bands) \
+        .toUint8()
+    combined_image = cropland_probabilities.mask(cropland_image) \
+        .blend(non_cropland_image) \
+        .unmask(not_irrigated) \
+        .clipToCollection(region_boundaries("world"))
+    return combined_image
+
+
+def main(output_mode='CLASSIFICATION'):
     years = range(2000, 2016)
     tasks = []
     for year in years:
-        combined_image = combine_maps(year)
-        task = export_image_to_drive(combined_image, f"{model_snapshot_version}_combined_{year}")
+        with profiler.span("post_processor", stage="post_processor", year=str(year)):
+            with profiler.span("build_graph", what="combined map"):
+                if output_mode == 'PROBABILITY':
+                    combined_image = combine_probability_maps(year)
+                    # Drive GeoTIFFs drop image properties, so the scale goes into the file name
+                    folder = f"{model_snapshot_version}_probabilities_combined_scale{probability_scale}_{year}"
+                else:
+                    combined_image = combine_maps(year)
+                    folder = f"{model_snapshot_version}_combined_{year}"
+            task = export_image_to_drive(combined_image, folder)
         tasks.append(task)
     wait_for_task_completion(tasks)
 
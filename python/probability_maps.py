@@ -0,0 +1,75 @@
+# Local readers for the quantized probability maps from classify_year(output_mode='PROBABILITY')
+# Each band holds one class probability as a byte, p = value / probability_scale.  Thresholds are applied here,
+# on the integers, so trying a different threshold does not need another export from GEE.
+# Requires: probability maps downloaded locally, see post_processor.py and raster_io.py
+
+import math
+import os
+import re
+
+import numpy as np
+import rasterio
+
+from raster_io import iter_windows, probabilities_path
+
+
+def probability_scale_of(path):
+    # GeoTIFFs written by GEE drop image properties, so post_processor.py puts the scale in the file name
+    match = re.search(r"_scale(\d+)_", os.path.basename(path))
+    if match is None:
+        raise ValueError(f"No probability scale in file name {path}, expected e.g. *_scale255_2015.tif")
+    return int(match.group(1))
+
+
+def read_probabilities(path, window=None):
+    scale = probability_scale_of(path)
+    with rasterio.open(path) as dataset:
+        probabilities = dataset.read(window=window)
+    assert probabilities.dtype == np.uint8, f"Expected quantized probabilities in {path}, got {probabilities.dtype}"
+    return probabilities, scale
+
+
+def quantized_threshold(threshold, scale):
+    # p >= threshold  <=>  value >= threshold * scale (0.5 * 255 = 127.5 gives 128); round first so that
+    # float error like 0.3 * 10 = 3.0000000000000004 doesn't push the cut up by one
+    return math.ceil(round(threshold * scale, 6))
+
+
+def irrigated_probability(probabilities):
+    # Irrigated = any class other than 0; uint16 so the sum cannot wrap around
+    return probabilities[1:].sum(axis=0, dtype=np.uint16)
+
+
+def classify(probabilities, scale, threshold=0.5):
+    # Irrigated if the irrigated classes together pass the threshold; then the likelier of the irrigated classes
+    irrigated = irrigated_probability(probabilities) >= quantized_threshold(threshold, scale)
+    irrigated_class = probabilities[1:].argmax(axis=0).astype(np.uint8) + 1
+    return np.where(irrigated, irrigated_class, 0).astype(np.uint8)
+
+
+def irrigated_pixels_by_threshold(path, thresholds, block_size=1024):
+    # One pass over the map gives the answer for every threshold: histogram the integer probabilities,
+    # then count everything at or above each threshold
+    with rasterio.open(path) as dataset:
+        width, height = dataset.width, dataset.height
+        num_bands = dataset.count
+    histogram = None
+    for window in iter_windows(width, height, block_size):
+        probabilities, scale = read_probabilities(path, window)
+        if histogram is None:
+            histogram = np.zeros(scale * (num_bands - 1) + 1, dtype=np.int64)
+        histogram += np.bincount(irrigated_probability(probabilities).ravel(), minlength=len(histogram))
+    at_or_above = np.append(histogram[::-1].cumsum()[::-1], 0)
+    return {threshold: int(at_or_above[min(quantized_threshold(threshold, scale), len(histogram))])
+            for threshold in thresholds}
+
+
+def main():
+    year = 2015
+    thresholds = [0.3, 0.4, 0.5, 0.6, 0.7]
+    for threshold, pixels in irrigated_pixels_by_threshold(probabilities_path(year), thresholds).items():
+        print(f"{year}, threshold {threshold}: {pixels} irrigated pixels")
+
+
+if __name__ == '__main__':
+    main()
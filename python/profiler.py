@@ -0,0 +1,175 @@
+# Records how long each stage of the pipeline takes, including time spent waiting on GEE
+# Spans are appended to a JSONL trace file; run this script to report on them:
+#   python3 profiler.py report [trace.jsonl]
+#   python3 profiler.py compare <old snapshot version> <new snapshot version> [trace.jsonl]
+
+import argparse
+import collections
+import contextlib
+import json
+import os
+import sys
+import time
+
+trace_path = os.environ.get("GIM_TRACE_PATH", "trace.jsonl")
+# Set by common.py, so that traces from different model versions can be compared
+snapshot_version = None
+# Stages slower than this ratio against the old version are flagged as regressions
+regression_ratio = 1.2
+# ... unless they take less than this many seconds anyway, where timings are mostly noise
+regression_min_seconds = 1.0
+
+# Fields from task.status() worth keeping; batch_eecu_usage_seconds only shows up on some tasks
+task_status_fields = ["id", "description", "state", "task_type", "creation_timestamp_ms", "start_timestamp_ms",
+                      "update_timestamp_ms", "batch_eecu_usage_seconds", "error_message"]
+
+_open_spans = []
+# task id -> attributes given at submission time (stage, year)
+_submitted_tasks = {}
+
+
+def write_record(record):
+    record.setdefault("snapshot", snapshot_version)
+    record.setdefault("script", os.path.basename(sys.argv[0]))
+    record.setdefault("pid", os.getpid())
+    with open(trace_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    # Nested spans inherit attributes (e.g. year) from the enclosing span
+    inherited = dict(_open_spans[-1]["attrs"]) if _open_spans else {}
+    inherited.update(attrs)
+    current = {"name": name, "attrs": inherited, "parent": _open_spans[-1]["name"] if _open_spans else None}
+    _open_spans.append(current)
+    start = time.time()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        _open_spans.pop()
+        write_record(dict(kind="span", name=name, parent=current["parent"], start=start,
+                          duration=time.time() - start, error=error, **current["attrs"]))
+
+
+def get_info(ee_object, what):
+    # Every .getInfo() blocks on a round trip to GEE, so each one gets its own span
+    with span("getInfo", what=what):
+        return ee_object.getInfo()
+
+
+def current_stage(default):
+    # Stage of the enclosing span, so that shared helpers file their tasks under the stage that called them
+    stage = _open_spans[-1]["attrs"].get("stage") if _open_spans else None
+    return stage or default
+
+
+def start_task(task, stage, **attrs):
+    with span("submit", stage=stage, **attrs) as current:
+        task.start()
+    _submitted_tasks[task.id] = current["attrs"]
+    return task
+
+
+def task_stage(tasks):
+    # The stage the tasks were submitted under, for attributing the wait on them; None if unknown
+    stages = {_submitted_tasks[t.id].get("stage") for t in tasks if t.id in _submitted_tasks}
+    stages.discard(None)
+    return "+".join(sorted(stages)) if stages else None
+
+
+def record_task_status(status):
+    # Called once per task when it reaches a final state; GEE timestamps give queue wait and run time
+    record = {field: status[field] for field in task_status_fields if field in status}
+    record.update(_submitted_tasks.get(status.get("id"), {}))
+    created = status.get("creation_timestamp_ms")
+    started = status.get("start_timestamp_ms")
+    updated = status.get("update_timestamp_ms")
+    if created is not None and started is not None:
+        record["queue_wait"] = (started - created) / 1000
+    if started is not None and updated is not None:
+        record["run_time"] = (updated - started) / 1000
+    write_record(dict(kind="task", **record))
+
+
+def read_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    # (stage, metric) -> list of seconds; the metric is the span name, or queue_wait/run_time/eecu for tasks
+    totals = collections.defaultdict(list)
+    # (stage, metric, year) -> seconds, from every span and task with a year
+    by_year = collections.defaultdict(float)
+    for record in records:
+        stage = record.get("stage", record.get("name", "task"))
+        year = record.get("year")
+        if record["kind"] == "span":
+            totals[(stage, record["name"])].append(record["duration"])
+            if year is not None:
+                by_year[(stage, record["name"], str(year))] += record["duration"]
+            continue
+        for metric in ["queue_wait", "run_time", "batch_eecu_usage_seconds"]:
+            if metric in record:
+                totals[(stage, metric)].append(record[metric])
+                if year is not None:
+                    by_year[(stage, metric, str(year))] += record[metric]
+    return totals, by_year
+
+
+def report(records):
+    totals, by_year = summarize(records)
+    print(f"{'stage':<30} {'metric':<28} {'count':>6} {'total s':>10} {'mean s':>10}")
+    for (stage, metric), values in sorted(totals.items()):
+        print(f"{stage:<30} {metric:<28} {len(values):>6} {sum(values):>10.1f} {sum(values) / len(values):>10.2f}")
+    if by_year:
+        print()
+        print(f"{'stage':<30} {'metric':<28} {'year':<8} {'total s':>10}")
+        for (stage, metric, year), total in sorted(by_year.items()):
+            print(f"{stage:<30} {metric:<28} {year:<8} {total:>10.1f}")
+
+
+def compare(records, old_version, new_version):
+    old_totals, _ = summarize([r for r in records if r.get("snapshot") == old_version])
+    new_totals, _ = summarize([r for r in records if r.get("snapshot") == new_version])
+    print(f"{'stage':<30} {'metric':<28} {old_version:>14} {new_version:>14} {'ratio':>7}")
+    regressions = 0
+    for key in sorted(set(old_totals) & set(new_totals)):
+        old_mean = sum(old_totals[key]) / len(old_totals[key])
+        new_mean = sum(new_totals[key]) / len(new_totals[key])
+        ratio = new_mean / old_mean if old_mean else float("inf")
+        flag = "  REGRESSION" if ratio > regression_ratio and new_mean >= regression_min_seconds else ""
+        regressions += bool(flag)
+        print(f"{key[0]:<30} {key[1]:<28} {old_mean:>14.2f} {new_mean:>14.2f} {ratio:>7.2f}{flag}")
+    print(f"{regressions} regression(s) above {regression_ratio}x")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on pipeline traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report")
+    report_parser.add_argument("trace", nargs="?", default=trace_path)
+    report_parser.add_argument("--snapshot", help="only this model snapshot version")
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("old_version")
+    compare_parser.add_argument("new_version")
+    compare_parser.add_argument("trace", nargs="?", default=trace_path)
+    args = parser.parse_args()
+
+    records = read_trace(args.trace)
+    if args.command == "report":
+        if args.snapshot:
+            records = [r for r in records if r.get("snapshot") == args.snapshot]
+        report(records)
+    else:
+        compare(records, args.old_version, args.new_version)
+
+
+if __name__ == '__main__':
+    main()
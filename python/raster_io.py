@@ -0,0 +1,107 @@
+# Local helpers for reading the exported maps (GeoTIFFs downloaded from Google Drive)
+# Unlike the other scripts, nothing here talks to GEE: it only needs numpy and rasterio
+
+import collections
+import glob
+import os
+
+import numpy as np
+import rasterio
+
+from affine import Affine
+from rasterio.windows import Window
+
+# Where the yearly combined maps live; see post_processor.py for how they are made
+results_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "results")
+results_file_prefix = "v3b_combined"
+# From post_processor.main(output_mode='PROBABILITY'), named {common.model_snapshot_version}_probabilities_combined
+probabilities_file_prefix = "post_mids_v3b_probabilities_combined"
+# Feature stores (the _features_{year} assets), exported with common.export_image_to_drive()
+features_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "features")
+features_file_prefix = "post_mids_v3b_features"
+
+# Class values in the combined maps: 0 = not irrigated, 1 and 2 = irrigated (ternary labels)
+num_classes = 3
+
+# The model grid in EPSG:4326; must match common.model_image_dimensions
+model_grid_width = 4320
+model_grid_height = 2160
+
+
+def results_path(year):
+    return os.path.join(results_directory, f"{results_file_prefix}_{year}.tif")
+
+
+def probabilities_path(year):
+    # File names carry the probability scale, e.g. post_mids_v3b_probabilities_combined_scale255_2015.tif
+    pattern = os.path.join(results_directory, f"{probabilities_file_prefix}_scale*_{year}.tif")
+    paths = glob.glob(pattern)
+    if len(paths) != 1:
+        raise FileNotFoundError(f"Expected one probability map matching {pattern}, found {len(paths)}")
+    return paths[0]
+
+
+def model_grid(factor=1):
+    # Width, height and transform of the global grid at `factor` times the model resolution
+    width = model_grid_width * factor
+    height = model_grid_height * factor
+    return width, height, Affine(360 / width, 0, -180, 0, -180 / height, 90)
+
+
+def features_path(year):
+    return os.path.join(features_directory, f"{features_file_prefix}_{year}.tif")
+
+
+def to_class_array(data):
+    # Exports come out as float64 with NaN over the oceans; classes fit in a byte
+    if data.dtype == np.uint8:
+        return data
+    if np.issubdtype(data.dtype, np.floating):
+        data = np.nan_to_num(data, nan=0.0, copy=False)
+    return data.astype(np.uint8)
+
+
+def read_class_map(path, window=None):
+    with rasterio.open(path) as dataset:
+        data = dataset.read(1, window=window)
+        transform = dataset.window_transform(window) if window is not None else dataset.transform
+    return to_class_array(data), transform
+
+
+def bbox_to_window(transform, width, height, bbox):
+    # bbox is (west, south, east, north) in degrees
+    west, south, east, north = bbox
+    col_off = int(np.floor((west - transform.c) / transform.a))
+    row_off = int(np.floor((north - transform.f) / transform.e))
+    col_end = int(np.ceil((east - transform.c) / transform.a))
+    row_end = int(np.ceil((south - transform.f) / transform.e))
+    col_off, col_end = max(col_off, 0), min(col_end, width)
+    row_off, row_end = max(row_off, 0), min(row_end, height)
+    if col_end <= col_off or row_end <= row_off:
+        raise ValueError(f"bbox {bbox} does not overlap the raster")
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+def read_class_map_in_bbox(path, bbox=None):
+    if bbox is None:
+        return read_class_map(path)
+    with rasterio.open(path) as dataset:
+        window = bbox_to_window(dataset.transform, dataset.width, dataset.height, bbox)
+    return read_class_map(path, window)
+
+
+def iter_windows(width, height, block_size):
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+
+
+def bounded_map(executor, fn, items, max_in_flight):
+    # Like executor.map(), but keeps at most max_in_flight results waiting for the consumer
+    pending = collections.deque()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
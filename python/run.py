@@ -1,5 +1,6 @@
 import ee
 import common
+import profiler
 import features_exporter
 import classifier as clf
 
@@ -8,14 +9,15 @@ def main(model_years):
     ee.Initialize()
     classifier = clf.build_worldwide_model()
     for year in model_years:
-        tasks = []
-        task = features_exporter.export_selected_features_for_year(year)
-        tasks.append(task)
-        common.wait_for_task_completion(tasks)
-        tasks = []
-        task = clf.classify_year(classifier, year)
-        tasks.append(task)
-        common.wait_for_task_completion(tasks)
+        with profiler.span("run", stage="run", year=year):
+            tasks = []
+            task = features_exporter.export_selected_features_for_year(year)
+            tasks.append(task)
+            common.wait_for_task_completion(tasks)
+            tasks = []
+            task = clf.classify_year(classifier, year)
+            tasks.append(task)
+            common.wait_for_task_completion(tasks)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 import ee
 
+import profiler
 from common import model_scale, wait_for_task_completion, model_projection, base_asset_directory
 
 
@@ -24,12 +25,12 @@ def export_point(id: str, coords: list, folder: str) -> ee.batch.Task:
     prefix = f"{id}"
     task = ee.batch.Export.image.toDrive(clipped_sat_image, folder=folder, scale=LANDSAT_RES,
                                          fileNamePrefix=prefix, region=outer_square)
-    task.start()
+    profiler.start_task(task, stage="sample_image_exporter")
     return task
 
 
 def export_samples(table_name: str) -> None:
-    table = ee.FeatureCollection(f"{base_asset_directory}/{table_name}").getInfo()
+    table = profiler.get_info(ee.FeatureCollection(f"{base_asset_directory}/{table_name}"), table_name)
     tasks = list(map(
         lambda p: export_point(p['id'], p['geometry']['coordinates'], table_name),
         table['features']
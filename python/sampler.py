@@ -1,4 +1,6 @@
 import ee
+
+import profiler
 from common import (region_boundaries, model_scale, wait_for_task_completion, model_projection, base_asset_directory,
                     export_asset_table_to_drive, num_samples, train_seed)
 
@@ -28,7 +30,7 @@ world_regions = [
 def get_total_area():
     all_regions = ee.FeatureCollection(list(map(region_boundaries, world_regions))).flatten()
     # compute this before doing anything else
-    total_area = all_regions.aggregate_sum('areaHa').getInfo()
+    total_area = profiler.get_info(all_regions.aggregate_sum('areaHa'), 'total area')
     return total_area
 
 
@@ -36,7 +38,7 @@ def read_sample(asset_name):
     try:
         sample_fc = ee.FeatureCollection(asset_name)
         # force materialization of feature collection
-        _ = sample_fc.limit(10).getInfo()
+        _ = profiler.get_info(sample_fc.limit(10), f'sample {asset_name}')
         # it worked: return table
         return sample_fc
     except ee.ee_exception.EEException:
@@ -51,7 +53,11 @@ def get_or_create_worldwide_sample_points(seed):
         return sample_fc
 
     print(f"creating sample {asset_name}")
+    with profiler.span("create_sample", stage="sampler", seed=seed):
+        return create_worldwide_sample_points(asset_name, seed)
+
 
+def create_worldwide_sample_points(asset_name, seed):
     total_area = get_total_area()
 
     def sample_region(region_fc):
@@ -92,7 +98,7 @@ def get_or_create_worldwide_sample_points(seed):
         assetId=asset_name,
         description=asset_name.replace('/', '_')
     )
-    task.start()
+    profiler.start_task(task, stage="sampler")
     wait_for_task_completion([task], exit_if_failures=True)
     return read_sample(asset_name)
 
@@ -100,7 +106,8 @@ def get_or_create_worldwide_sample_points(seed):
 def main():
     ee.Initialize()
     get_or_create_worldwide_sample_points(train_seed)
-    export_asset_table_to_drive(f'{base_asset_directory}/samples_{num_samples}')
+    with profiler.span("export_samples", stage="sampler"):
+        export_asset_table_to_drive(f'{base_asset_directory}/samples_{num_samples}')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,212 @@
+# Sparse representation of the yearly combined maps, for fast aggregation over the whole time series
+# Only about 2.5% of the pixels are irrigated, so we keep just those: sorted linear pixel indices
+# (row * width + col) and their class values.  A run-length variant packs neighbouring pixels further.
+# Requires: combined maps downloaded locally, see post_processor.py and raster_io.py
+
+import os
+
+import numpy as np
+import rasterio
+
+from affine import Affine
+from rasterio.windows import Window
+
+from raster_io import results_path, to_class_array
+
+earth_radius_m = 6371007.2
+square_m_per_ha = 10000.0
+# Rows read at a time when converting a GeoTIFF, so we never hold a full float64 frame
+strip_rows = 256
+
+
+class SparseMap:
+    def __init__(self, indices, values, width, height, transform):
+        self.indices = np.asarray(indices, dtype=np.uint32)
+        self.values = np.asarray(values, dtype=np.uint8)
+        self.width = width
+        self.height = height
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_dense(cls, class_map, transform):
+        indices = np.flatnonzero(class_map)
+        return cls(indices, class_map.ravel()[indices], class_map.shape[1], class_map.shape[0], transform)
+
+    @classmethod
+    def from_geotiff(cls, path):
+        indices = []
+        values = []
+        with rasterio.open(path) as dataset:
+            width, height, transform = dataset.width, dataset.height, dataset.transform
+            for row_off in range(0, height, strip_rows):
+                window = Window(0, row_off, width, min(strip_rows, height - row_off))
+                strip = to_class_array(dataset.read(1, window=window))
+                strip_indices = np.flatnonzero(strip)
+                indices.append(strip_indices + row_off * width)
+                values.append(strip.ravel()[strip_indices])
+        return cls(np.concatenate(indices), np.concatenate(values), width, height, transform)
+
+    def to_dense(self):
+        class_map = np.zeros(self.height * self.width, dtype=np.uint8)
+        class_map[self.indices] = self.values
+        return class_map.reshape(self.height, self.width)
+
+    def with_indices(self, indices, values):
+        return SparseMap(indices, values, self.width, self.height, self.transform)
+
+    def rows_cols(self):
+        return np.divmod(self.indices, self.width)
+
+    def select_class(self, *classes):
+        keep = np.isin(self.values, classes)
+        return self.with_indices(self.indices[keep], self.values[keep])
+
+    def in_bbox(self, bbox):
+        # bbox is (west, south, east, north) in degrees; keeps pixels whose top-left corner is inside
+        west, south, east, north = bbox
+        rows, cols = self.rows_cols()
+        lons = self.transform.c + cols * self.transform.a
+        lats = self.transform.f + rows * self.transform.e
+        keep = (lons >= west) & (lons < east) & (lats <= north) & (lats > south)
+        return self.with_indices(self.indices[keep], self.values[keep])
+
+    def pixel_area_ha_by_row(self):
+        # Pixels on a lat/lon grid shrink towards the poles: area = R^2 * dlon * (sin(lat_top) - sin(lat_bottom))
+        lat_edges = np.radians(np.clip(self.transform.f + np.arange(self.height + 1) * self.transform.e, -90, 90))
+        dlon = np.radians(abs(self.transform.a))
+        return earth_radius_m ** 2 * dlon * np.abs(np.diff(np.sin(lat_edges))) / square_m_per_ha
+
+    def area_ha(self):
+        rows = self.indices // self.width
+        return float(self.pixel_area_ha_by_row()[rows].sum())
+
+    def area_ha_by_class(self):
+        rows = self.indices // self.width
+        areas = np.bincount(self.values, weights=self.pixel_area_ha_by_row()[rows])
+        return {int(c): float(a) for c, a in enumerate(areas) if c > 0}
+
+    def to_rle(self):
+        return RunLengthMap.from_sparse(self)
+
+    def save(self, path):
+        np.savez_compressed(path, indices=self.indices, values=self.values, shape=(self.height, self.width),
+                            transform=np.array(self.transform)[:6])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            height, width = data['shape']
+            return cls(data['indices'], data['values'], int(width), int(height), Affine(*data['transform']))
+
+
+class RunLengthMap:
+    # Runs of consecutive pixels (in row-major order) that share a class value
+    def __init__(self, starts, lengths, values, width, height, transform):
+        self.starts = np.asarray(starts, dtype=np.uint32)
+        self.lengths = np.asarray(lengths, dtype=np.uint32)
+        self.values = np.asarray(values, dtype=np.uint8)
+        self.width = width
+        self.height = height
+        self.transform = transform
+
+    @classmethod
+    def from_sparse(cls, sparse_map):
+        indices, values = sparse_map.indices, sparse_map.values
+        if len(indices) == 0:
+            return cls([], [], [], sparse_map.width, sparse_map.height, sparse_map.transform)
+        # A run breaks where the index jumps or the class changes
+        breaks = np.flatnonzero((np.diff(indices) != 1) | (np.diff(values) != 0)) + 1
+        run_starts = np.concatenate(([0], breaks))
+        run_ends = np.concatenate((breaks, [len(indices)]))
+        return cls(indices[run_starts], run_ends - run_starts, values[run_starts],
+                   sparse_map.width, sparse_map.height, sparse_map.transform)
+
+    def to_sparse(self):
+        total = int(self.lengths.sum())
+        # Expand runs without a Python loop: offset within each run added to the run start
+        run_ids = np.repeat(np.arange(len(self.starts)), self.lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(self.lengths) - self.lengths, self.lengths)
+        indices = self.starts[run_ids] + offsets.astype(np.uint32)
+        return SparseMap(indices, self.values[run_ids], self.width, self.height, self.transform)
+
+
+def gained(before, after):
+    # Irrigated in `after` but not in `before`
+    keep = ~np.isin(after.indices, before.indices, assume_unique=True)
+    return after.with_indices(after.indices[keep], after.values[keep])
+
+
+def lost(before, after):
+    return gained(after, before)
+
+
+def persistent(before, after):
+    # Irrigated in both years; values are taken from `after`
+    keep = np.isin(after.indices, before.indices, assume_unique=True)
+    return after.with_indices(after.indices[keep], after.values[keep])
+
+
+def merge_series(sparse_maps):
+    # Every pixel irrigated in any year (sorted) and in how many years.  One sort over all years' indices,
+    # which are sorted runs already, then counts from where the value changes; cheaper than np.unique()
+    merged = np.concatenate([m.indices for m in sparse_maps])
+    merged.sort()
+    if len(merged) == 0:
+        return merged, np.zeros(0, dtype=np.uint8)
+    is_first = np.empty(len(merged), dtype=bool)
+    is_first[0] = True
+    np.not_equal(merged[1:], merged[:-1], out=is_first[1:])
+    starts = np.flatnonzero(is_first)
+    return merged[starts], np.diff(starts, append=len(merged)).astype(np.uint8)
+
+
+def persistent_in_all(sparse_maps):
+    # Irrigated in every year; values are taken from the last year
+    indices, counts = merge_series(sparse_maps)
+    indices = indices[counts == len(sparse_maps)]
+    last = sparse_maps[-1]
+    return last.with_indices(indices, last.values[np.searchsorted(last.indices, indices)])
+
+
+def irrigation_frequency(sparse_maps):
+    # How many years each pixel was irrigated, as a sparse map of counts
+    indices, counts = merge_series(sparse_maps)
+    first = sparse_maps[0]
+    return first.with_indices(indices, counts)
+
+
+def cache_path(year, cache_directory):
+    return os.path.join(cache_directory, f"sparse_{year}.npz")
+
+
+def load_series(years, cache_directory=None):
+    # Converts each GeoTIFF once and reuses the .npz afterwards
+    series = {}
+    for year in years:
+        path = cache_path(year, cache_directory) if cache_directory else None
+        if path and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(results_path(year)):
+            series[year] = SparseMap.load(path)
+            continue
+        series[year] = SparseMap.from_geotiff(results_path(year))
+        if path:
+            os.makedirs(cache_directory, exist_ok=True)
+            series[year].save(path)
+    return series
+
+
+def main():
+    years = list(range(2001, 2016))
+    series = load_series(years, cache_directory="sparse_cache")
+    for year in years:
+        print(f"{year}: {series[year].area_ha():.0f} ha irrigated")
+    first, last = series[years[0]], series[years[-1]]
+    print(f"Gained {years[0]}-{years[-1]}: {gained(first, last).area_ha():.0f} ha")
+    print(f"Lost {years[0]}-{years[-1]}: {lost(first, last).area_ha():.0f} ha")
+    print(f"Irrigated in every year: {persistent_in_all([series[y] for y in years]).area_ha():.0f} ha")
+
+
+if __name__ == '__main__':
+    main()
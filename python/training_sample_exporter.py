@@ -4,6 +4,7 @@
 
 import ee
 
+import profiler
 from common import (model_scale, wait_for_task_completion, get_features_image, get_labels, model_snapshot_path_prefix,
                     export_asset_table_to_drive, model_projection, num_samples, label_year, train_seed)
 from sampler import get_or_create_worldwide_sample_points
@@ -38,7 +39,7 @@ def main():
         assetId=image_asset_id,
         description=asset_description
     )
-    task.start()
+    profiler.start_task(task, stage="training_sample", year=label_year)
     wait_for_task_completion([task], exit_if_failures=True)
 
     # Step 3/3: convert image into a table
@@ -55,11 +56,12 @@ def main():
         assetId=table_asset_id,
         description=asset_description.replace('/', '_')
     )
-    task.start()
+    profiler.start_task(task, stage="training_sample", year=label_year)
     wait_for_task_completion([task], exit_if_failures=True)
 
     # Step 3a: export to drive for offline model development
-    export_asset_table_to_drive(table_asset_id)
+    with profiler.span("export_samples", stage="training_sample", year=label_year):
+        export_asset_table_to_drive(table_asset_id)
 
 
 if __name__ == '__main__':